@@ -2,19 +2,61 @@
 Analysis of hero pick rates, ban rates, and win rates in Dota 2 matches.
 
 This script processes match data to generate and visualize statistics about hero usage patterns,
-including pick rates, ban rates, and win rates. The results are saved as PNG files.
+including pick rates, ban rates, and win rates. Every rate is reported together with a Wilson
+score interval and a bootstrap percentile interval, and the results are saved as PNG files
+(optionally also as interactive Plotly HTML files).
 """
 
+import argparse
 import collections
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from statistics import NormalDist
+import hashlib
 import json
+import math
+import os
+import sys
 import jsonlines
+import numpy as np
 import pandas as pd
+from threadpoolctl import threadpool_limits
+import matplotlib
+
+# Plots are only ever written to files, also from worker processes without a display
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
+try:
+    import instrumentation
+except ImportError:
+    # Run as a script (python EDA/EDA.py): the shared modules live in the repository root
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    import instrumentation
+
 # Constants
 CURRENT_DIR = Path(__file__).parent
 DATA_DIR = CURRENT_DIR.parent
+RATE_METRICS = ["usage_rate", "ban_rate", "win_rate"]
+CONFIDENCE_LEVEL = 0.95
+N_RESAMPLES = 10000
+# Cached bootstrap bounds, stored next to the plots
+BOOTSTRAP_CACHE_FILE = "bootstrap_intervals.csv"
+# Number of bootstrap resamples handled by one worker task
+RESAMPLE_CHUNK = 256
+# Upper bound on the number of float32 cells in each per-block matrix of a bootstrap chunk
+# (the resample weights and the block's rows of the count matrix)
+CHUNK_ELEMENTS = 2 ** 22
+
+# Plots generated by main(): (metric, output file name, draw the 50% baseline)
+PLOT_SPECS = [
+    ("usage_rate", "heroes_pick_distribution.png", False),
+    ("ban_rate", "heroes_ban_distribution.png", False),
+    ("win_rate", "heroes_winrate_distribution.png", True),
+]
+
+# Count arrays shared with bootstrap worker processes (set once per worker by the initializer)
+_bootstrap_arrays = {}
 
 def load_matches(data_dir):
     """Load match data from jsonlines file."""
@@ -25,9 +67,15 @@ def load_matches(data_dir):
     return matches
 
 def load_heroes(data_dir):
-    """Load hero data from JSON file and create a hero_id to hero mapping."""
+    """Load hero data from JSON file and create a hero_id to hero mapping.
+
+    Accepts both a bare list of heroes and the ``{"heroes": [...]}`` format written by
+    ``convert_to_public_dataset.py``.
+    """
     with open(data_dir / "heroes.json", "r") as f:
         raw_heroes = json.load(f)
+    if isinstance(raw_heroes, dict):
+        raw_heroes = raw_heroes["heroes"]
     return {hero["hero_id"]: hero for hero in raw_heroes}
 
 def calculate_hero_statistics(matches):
@@ -56,8 +104,10 @@ def create_hero_dataframe(usage_stats, heroes):
     for hero_id, stats in usage_stats.items():
         total_games = stats["win"] + stats["lose"]
         data.append({
+            "hero_id": hero_id,
             "hero_name": heroes[hero_id]["name"],
             "count": total_games,
+            "win_count": stats["win"],
             "baned_count": stats.get("ban", 0),
             "win_rate": stats["win"] / total_games if total_games > 0 else 0
         })
@@ -70,36 +120,357 @@ def create_hero_dataframe(usage_stats, heroes):
     
     return df
 
-def plot_hero_statistics(df, metric, output_path, add_baseline=False):
-    """Plot and save hero statistics."""
-    plt.figure(figsize=(20, 5))
+def build_count_arrays(matches, hero_ids):
+    """Build the per-match hero count matrix used for vectorized resampling.
+
+    Row ``i`` of the ``uint8`` matrix holds, for match ``i`` and per hero in ``hero_ids``, the
+    number of games, then wins, then bans. At one byte per cell it takes about as much memory
+    as int64 index arrays of the (roughly 20) picks and bans per match would, while letting
+    any per-match weighting be reduced to per-hero counts with one matrix product.
+    """
+    hero_index = {hero_id: i for i, hero_id in enumerate(hero_ids)}
+    n_heroes = len(hero_ids)
+    rows, cols = [], []
+
+    for match_idx, match in enumerate(matches):
+        sides = [(match["RadiantHeroes"], match["radiant_win"]), (match["DireHeroes"], not match["radiant_win"])]
+        for heroes, won in sides:
+            for hero in heroes:
+                rows.append(match_idx)
+                cols.append(hero_index[hero])
+                if won:
+                    rows.append(match_idx)
+                    cols.append(hero_index[hero] + n_heroes)
+        for hero in match["RadiantBanedHeroes"] + match["DireBanedHeroes"]:
+            rows.append(match_idx)
+            cols.append(hero_index[hero] + 2 * n_heroes)
+
+    counts = np.zeros((len(matches), 3 * n_heroes), dtype=np.uint8)
+    np.add.at(counts, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), 1)
+    return {"n_matches": len(matches), "n_heroes": n_heroes, "counts": counts}
+
+def wilson_interval(successes, totals, confidence=CONFIDENCE_LEVEL):
+    """Compute Wilson score intervals for arrays of success and trial counts.
+
+    Entries with zero trials get NaN bounds.
+    """
+    successes = np.asarray(successes, dtype=float)
+    totals = np.asarray(totals, dtype=float)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = successes / totals
+        denominator = 1 + z ** 2 / totals
+        center = (p + z ** 2 / (2 * totals)) / denominator
+        margin = z * np.sqrt(p * (1 - p) / totals + z ** 2 / (4 * totals ** 2)) / denominator
+
+    low = np.where(totals > 0, center - margin, np.nan)
+    high = np.where(totals > 0, center + margin, np.nan)
+    return low, high
+
+def _poisson_table(size=2 ** 16):
+    """Build a lookup table mapping uniform 16-bit integers to Poisson(1) draws.
+
+    Indexing this table with random ``uint16`` values is several times faster than
+    ``Generator.poisson`` and its probabilities are within 2**-16 of the exact distribution.
+    """
+    pmf = [math.exp(-1) / math.factorial(k) for k in range(16)]
+    return np.searchsorted(np.cumsum(pmf), (np.arange(size) + 0.5) / size).astype(np.float32)
+
+def _init_bootstrap_worker(arrays):
+    """Store the count arrays in a worker process so they are pickled only once per worker."""
+    _bootstrap_arrays.clear()
+    _bootstrap_arrays.update(arrays)
+    _bootstrap_arrays["poisson_table"] = _poisson_table()
+
+def _init_bootstrap_pool_worker(arrays):
+    """Set up a pool worker, limiting BLAS to one thread so the workers do not oversubscribe the CPUs."""
+    threadpool_limits(limits=1)
+    _init_bootstrap_worker(arrays)
+
+def _bootstrap_chunk(seed_seq, n_rows):
+    """Draw ``n_rows`` Poisson bootstrap resamples and return the resampled hero rates.
+
+    Every match gets an independent Poisson(1) weight, which approximates multinomial
+    resampling of matches. Matches are processed in blocks so each block reduces to one
+    matrix product of the weights with the block's rows of the precomputed count matrix.
+    """
+    arrays = _bootstrap_arrays
+    n_heroes, n_matches, counts = arrays["n_heroes"], arrays["n_matches"], arrays["counts"]
+    rng = np.random.default_rng(seed_seq)
+    block_size = max(1, CHUNK_ELEMENTS // max(n_rows, counts.shape[1]))
+    totals = np.zeros((n_rows, 3 * n_heroes))
+
+    for start in range(0, n_matches, block_size):
+        stop = min(start + block_size, n_matches)
+        draws = rng.integers(0, 2 ** 16, size=(n_rows, stop - start), dtype=np.uint16)
+        totals += arrays["poisson_table"][draws] @ counts[start:stop].astype(np.float32)
+
+    games, wins, bans = np.split(totals, 3, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "usage_rate": games / games.sum(axis=1, keepdims=True),
+            "ban_rate": bans / bans.sum(axis=1, keepdims=True),
+            "win_rate": wins / games,
+        }
+
+def bootstrap_rates(arrays, n_resamples=N_RESAMPLES, seed=0, n_jobs=None):
+    """Bootstrap the usage, ban and win rate of every hero.
+
+    Resamples are drawn in chunks of ``RESAMPLE_CHUNK`` (walking the matches in blocks whose
+    weight and count matrices hold at most ``CHUNK_ELEMENTS`` cells each) and spread over ``n_jobs`` worker processes (all CPUs by
+    default). Chunk seeds are spawned from ``seed``, so results do not depend on the number
+    of workers.
+
+    Returns:
+        Dict mapping each rate metric to an array of shape (n_resamples, n_heroes)
+    """
+    chunk_sizes = [min(RESAMPLE_CHUNK, n_resamples - start) for start in range(0, n_resamples, RESAMPLE_CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    if n_jobs == 1 or len(chunk_sizes) == 1:
+        _init_bootstrap_worker(arrays)
+        try:
+            results = list(map(_bootstrap_chunk, seeds, chunk_sizes))
+        finally:
+            # Do not keep the (possibly very large) count matrix alive in this process
+            _bootstrap_arrays.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_bootstrap_pool_worker,
+                                 initargs=(arrays,)) as executor:
+            results = list(executor.map(_bootstrap_chunk, seeds, chunk_sizes))
+
+    return {metric: np.concatenate([r[metric] for r in results]) for metric in RATE_METRICS}
+
+def _bootstrap_input_hash(arrays, hero_ids, confidence, n_resamples, seed):
+    """Hash the count matrix, hero order and bootstrap parameters that the bootstrap bounds depend on."""
+    digest = hashlib.sha256(repr((list(hero_ids), confidence, n_resamples, seed)).encode())
+    digest.update(arrays["counts"].tobytes())
+    return digest.hexdigest()
+
+def _load_cached_bounds(cache_file, digest):
+    """Return the cached bootstrap bounds if ``cache_file`` was written for inputs with this digest."""
+    if cache_file is None:
+        return None
+    hash_file = Path(f"{cache_file}.sha256")
+    if not Path(cache_file).exists() or not hash_file.exists() or hash_file.read_text() != digest:
+        return None
+    return pd.read_csv(cache_file)
+
+def add_confidence_intervals(df, matches, confidence=CONFIDENCE_LEVEL, n_resamples=N_RESAMPLES,
+                             seed=0, n_jobs=None, cache_file=None):
+    """Add Wilson and bootstrap interval columns for every rate metric to the hero DataFrame.
+
+    For each metric ``<rate>`` the columns ``<rate>_wilson_low``, ``<rate>_wilson_high``,
+    ``<rate>_boot_low`` and ``<rate>_boot_high`` are added. When ``cache_file`` is given, the
+    bootstrap bounds are stored there with the hash of their inputs in ``<cache_file>.sha256``
+    and reused as long as the matches and parameters are unchanged.
+    """
+    df = df.copy()
+    successes = {
+        "usage_rate": (df["count"], df["count"].sum()),
+        "ban_rate": (df["baned_count"], df["baned_count"].sum()),
+        "win_rate": (df["win_count"], df["count"]),
+    }
+    for metric, (hits, totals) in successes.items():
+        totals = np.broadcast_to(np.asarray(totals, dtype=float), len(df))
+        df[f"{metric}_wilson_low"], df[f"{metric}_wilson_high"] = wilson_interval(hits, totals, confidence)
+
+    arrays = build_count_arrays(matches, df["hero_id"].tolist())
+    boot_columns = [f"{metric}_boot_{bound}" for metric in RATE_METRICS for bound in ("low", "high")]
+    digest = _bootstrap_input_hash(arrays, df["hero_id"], confidence, n_resamples, seed)
+    cached = _load_cached_bounds(cache_file, digest)
+    if cached is not None:
+        # The digest covers the hero order, so the cached rows line up with the DataFrame
+        df[boot_columns] = cached[boot_columns].to_numpy()
+        return df
+
+    resampled = bootstrap_rates(arrays, n_resamples=n_resamples, seed=seed, n_jobs=n_jobs)
+    tail = (1 - confidence) / 2 * 100
+    for metric in RATE_METRICS:
+        with np.errstate(invalid="ignore"):
+            all_nan = np.isnan(resampled[metric]).all(axis=0)
+            samples = np.where(all_nan, 0.0, resampled[metric])
+            low, high = np.nanpercentile(samples, [tail, 100 - tail], axis=0)
+        df[f"{metric}_boot_low"] = np.where(all_nan, np.nan, low)
+        df[f"{metric}_boot_high"] = np.where(all_nan, np.nan, high)
+
+    if cache_file is not None:
+        df[["hero_id"] + boot_columns].to_csv(cache_file, index=False)
+        Path(f"{cache_file}.sha256").write_text(digest)
+    return df
+
+def _plot_columns(df, metric, interval):
+    """Return the columns a plot of ``metric`` reads, in a stable order."""
+    columns = ["hero_name", metric, f"{metric}_{interval}_low", f"{metric}_{interval}_high"]
+    return [column for column in columns if column in df]
+
+def plot_input_hash(df, metric, add_baseline=False, interval="boot"):
+    """Hash the series and options a plot is drawn from, to detect when it must be re-rendered."""
+    digest = hashlib.sha256(repr((metric, add_baseline, interval)).encode())
+    plot_df = df[_plot_columns(df, metric, interval)]
+    digest.update(",".join(plot_df.columns).encode())
+    digest.update(pd.util.hash_pandas_object(plot_df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+def _error_bars(df_sorted, metric, interval):
+    """Return the (2, N) lower/upper error bar lengths, or None when no bounds are available."""
+    low_col, high_col = f"{metric}_{interval}_low", f"{metric}_{interval}_high"
+    if low_col not in df_sorted or high_col not in df_sorted:
+        return None
+    return np.nan_to_num(np.vstack([
+        df_sorted[metric] - df_sorted[low_col],
+        df_sorted[high_col] - df_sorted[metric],
+    ])).clip(min=0)
+
+def plot_hero_statistics(df, metric, output_path, add_baseline=False, interval="boot"):
+    """Plot and save hero statistics.
+
+    When the DataFrame carries ``<metric>_<interval>_low``/``_high`` columns they are drawn
+    as error bars; ``interval`` selects ``"boot"`` or ``"wilson"`` bounds.
+    """
     df_sorted = df.sort_values(by=metric, ascending=False)
-    ax = df_sorted.plot(kind="bar", x="hero_name", y=metric, figsize=(20, 5))
+    fig, ax = plt.subplots(figsize=(20, 5))
+    df_sorted.plot(kind="bar", x="hero_name", y=metric, ax=ax)
+
+    yerr = _error_bars(df_sorted, metric, interval)
+    if yerr is not None:
+        ax.errorbar(range(len(df_sorted)), df_sorted[metric], yerr=yerr, fmt="none",
+                    ecolor="black", elinewidth=0.8, capsize=1.5)
     
     # Rotate labels 90 degrees
-    plt.xticks(rotation=90)
+    ax.tick_params(axis="x", labelrotation=90)
     
     if add_baseline:
-        plt.axhline(y=0.5, color="r", linestyle="-")
+        ax.axhline(y=0.5, color="r", linestyle="-")
     
-    plt.tight_layout()  # Automatically adjust layout to prevent label clipping
-    plt.savefig(output_path, bbox_inches='tight')  # Ensure no labels are clipped when saving
-    plt.close()
+    fig.tight_layout()  # Automatically adjust layout to prevent label clipping
+    fig.savefig(output_path, bbox_inches='tight')  # Ensure no labels are clipped when saving
+    plt.close(fig)
+
+def plot_hero_statistics_html(df, metric, output_path, add_baseline=False, interval="boot"):
+    """Plot hero statistics as an interactive Plotly bar chart and save it as HTML."""
+    import plotly.graph_objects as go
+
+    df_sorted = df.sort_values(by=metric, ascending=False)
+    yerr = _error_bars(df_sorted, metric, interval)
+    error_y = None
+    if yerr is not None:
+        error_y = dict(type="data", symmetric=False, array=yerr[1], arrayminus=yerr[0])
+
+    fig = go.Figure(go.Bar(x=df_sorted["hero_name"], y=df_sorted[metric], error_y=error_y, name=metric))
+    if add_baseline:
+        fig.add_hline(y=0.5, line_color="red")
+    fig.update_layout(xaxis_title="hero_name", yaxis_title=metric, xaxis_tickangle=-90)
+    fig.write_html(output_path, include_plotlyjs="cdn")
 
-def main():
+def _is_up_to_date(output_path, digest):
+    """Return whether ``output_path`` exists and was rendered from inputs with this digest."""
+    hash_file = Path(f"{output_path}.sha256")
+    return output_path.exists() and hash_file.exists() and hash_file.read_text() == digest
+
+def _render_plot(df, metric, output_paths, add_baseline, interval, digest):
+    """Render one plot to the given PNG/HTML paths (in a worker process) and record their input hash.
+
+    Each output gets its own ``<output>.sha256`` file, so the PNG and HTML are kept up to date
+    independently.
+    """
+    for output_path in output_paths:
+        if output_path.suffix == ".html":
+            plot_hero_statistics_html(df, metric, output_path, add_baseline, interval)
+        else:
+            plot_hero_statistics(df, metric, output_path, add_baseline, interval)
+        Path(f"{output_path}.sha256").write_text(digest)
+    return output_paths
+
+def render_plots(df, plot_specs, output_dir, interval="boot", html=False, force=False, n_jobs=None):
+    """Render several hero statistic plots in parallel worker processes.
+
+    The PNG (and HTML, if requested) of a plot is skipped when it exists and the hash of its
+    input series matches the one stored next to it in ``<output>.sha256``, unless ``force``
+    is set.
+
+    Args:
+        plot_specs: Iterable of ``(metric, file name, add_baseline)`` tuples
+        n_jobs: Number of worker processes (defaults to one per plot, capped at the CPU count)
+
+    Returns:
+        List of paths of the PNG and HTML files that were rendered
+    """
+    output_dir = Path(output_dir)
+    tasks = []
+    for metric, file_name, add_baseline in plot_specs:
+        png_path = output_dir / file_name
+        digest = plot_input_hash(df, metric, add_baseline, interval)
+        candidates = [png_path, png_path.with_suffix(".html")] if html else [png_path]
+        stale = [path for path in candidates if force or not _is_up_to_date(path, digest)]
+        if stale:
+            # Only ship the columns the plot reads to the worker
+            plot_df = df[_plot_columns(df, metric, interval)]
+            tasks.append((plot_df, metric, stale, add_baseline, interval, digest))
+
+    if not tasks:
+        return []
+
+    n_jobs = n_jobs or min(len(tasks), os.cpu_count() or 1)
+    if n_jobs == 1 or len(tasks) == 1:
+        return [path for task in tasks for path in _render_plot(*task)]
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [executor.submit(_render_plot, *task) for task in tasks]
+        return [path for future in futures for path in future.result()]
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--html", action="store_true", help="also write interactive Plotly HTML plots")
+    parser.add_argument("--force", action="store_true", help="re-render plots even if their inputs are unchanged")
+    parser.add_argument("--jobs", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--resamples", type=int, default=N_RESAMPLES,
+                        help=f"number of bootstrap resamples (default: {N_RESAMPLES})")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def run_eda(html=False, force=False, n_jobs=None, data_dir=DATA_DIR, output_dir=CURRENT_DIR,
+            n_resamples=N_RESAMPLES):
+    """Compute hero statistics from the dataset in ``data_dir`` and render all plots to ``output_dir``.
+
+    Bootstrap bounds are cached in ``output_dir``, so a run on unchanged matches skips the bootstrap.
+    """
+    data_dir, output_dir = Path(data_dir), Path(output_dir)
     # Load data
-    matches = load_matches(DATA_DIR)
-    heroes = load_heroes(DATA_DIR)
+    with instrumentation.span("load_data") as stage:
+        matches = load_matches(data_dir)
+        heroes = load_heroes(data_dir)
+        stage.add_records(len(matches))
     
     # Process data
-    usage_stats = calculate_hero_statistics(matches)
-    hero_df = create_hero_dataframe(usage_stats, heroes)
+    with instrumentation.span("hero_statistics") as stage:
+        usage_stats = calculate_hero_statistics(matches)
+        hero_df = create_hero_dataframe(usage_stats, heroes)
+        stage.add_records(len(matches))
+    with instrumentation.span("confidence_intervals") as stage:
+        hero_df = add_confidence_intervals(hero_df, matches, n_resamples=n_resamples, n_jobs=n_jobs,
+                                           cache_file=output_dir / BOOTSTRAP_CACHE_FILE)
+        stage.add_records(len(hero_df))
     
     # Generate plots
-    plot_hero_statistics(hero_df, "usage_rate", CURRENT_DIR / "heroes_pick_distribution.png")
-    plot_hero_statistics(hero_df, "ban_rate", CURRENT_DIR / "heroes_ban_distribution.png")
-    plot_hero_statistics(hero_df, "win_rate", CURRENT_DIR / "heroes_winrate_distribution.png", 
-                        add_baseline=True)
+    with instrumentation.span("render_plots") as stage:
+        rendered = render_plots(hero_df, PLOT_SPECS, output_dir, html=html, force=force, n_jobs=n_jobs)
+        # A plot may have been rendered to both a PNG and an HTML file
+        n_plots = len({path.with_suffix("") for path in rendered})
+        stage.add_records(n_plots)
+    print(f"Rendered {n_plots} of {len(PLOT_SPECS)} plots ({len(rendered)} files)")
+
+def main(argv=None):
+    args = parse_args(argv)
+    instrumentation.configure(args)
+
+    try:
+        run_eda(html=args.html, force=args.force, n_jobs=args.jobs, n_resamples=args.resamples)
+    finally:
+        instrumentation.write_report("EDA")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -5,11 +5,14 @@ It processes two main data files:
 2. heroes.json - Contains hero information from the game
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import argparse
 import json
 from pathlib import Path
 import jsonlines
 
+import instrumentation
+
 # Constants
 MATCHES_FILE = "matches.jsonl"
 HEROES_FILE = "heroes.json"
@@ -29,14 +32,18 @@ def process_matches(input_data: Any) -> Dict[str, Any]:
             raise FileNotFoundError(f"Input file not found: {input_data}")
             
         with jsonlines.open(input_data) as reader:
-            dataset = []
-            for id, obj in enumerate(reader):
-                obj["match_id"] = id  # Reassign match_id to be sequential
-                dataset.append(obj)
+            with instrumentation.span("read_matches") as stage:
+                dataset = []
+                for id, obj in enumerate(reader):
+                    obj["match_id"] = id  # Reassign match_id to be sequential
+                    dataset.append(obj)
+                stage.add_records(len(dataset))
                 
             # Write back to the same file
-            with jsonlines.open(input_data, mode="w") as writer:
-                writer.write_all(dataset)
+            with instrumentation.span("rewrite_matches") as stage:
+                with jsonlines.open(input_data, mode="w") as writer:
+                    writer.write_all(dataset)
+                stage.add_records(len(dataset))
                 
             return dataset[0] if dataset else {}
     else:
@@ -47,7 +54,11 @@ def process_matches(input_data: Any) -> Dict[str, Any]:
         }
 
 def process_heroes(input_file: str) -> None:
-    """Process the heroes.json file by standardizing hero information format."""
+    """Process the heroes.json file by standardizing hero information format.
+
+    Files that are already in the standardized ``{"heroes": [...]}`` format are left unchanged,
+    so the conversion can safely run more than once.
+    """
     input_path = Path(input_file)
     
     if not input_path.exists():
@@ -55,6 +66,8 @@ def process_heroes(input_file: str) -> None:
         
     with open(input_file, 'r', encoding='utf-8') as fd:
         raw_data = json.load(fd)
+        if "constants" not in raw_data and "heroes" in raw_data:
+            return
         records = raw_data["constants"]["heroes"]
         
         # Process and standardize hero information
@@ -71,14 +84,21 @@ def process_heroes(input_file: str) -> None:
     with open(input_file, 'w', encoding='utf-8') as fd:
         json.dump({"heroes": heroes}, fd, indent=4)
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     """Main function to orchestrate the data conversion process."""
+    parser = argparse.ArgumentParser(description="Convert matches and heroes into the public dataset format.")
+    instrumentation.add_arguments(parser)
+    instrumentation.configure(parser.parse_args(argv))
+
     try:
         process_matches(MATCHES_FILE)
-        process_heroes(HEROES_FILE)
+        with instrumentation.span("convert_heroes"):
+            process_heroes(HEROES_FILE)
     except Exception as e:
         print(f"Error: {str(e)}")
         raise
+    finally:
+        instrumentation.write_report("convert_to_public_dataset")
 
 if __name__ == "__main__":
     main()
@@ -2,7 +2,8 @@
 This module fetches match data for Dota 2 players using the STRATZ API.
 """
 
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional, Tuple
+import argparse
 import json
 import os
 from pathlib import Path
@@ -11,7 +12,9 @@ import pandas as pd
 from gql import gql, Client
 from gql.transport.requests import RequestsHTTPTransport
 from gql.transport.exceptions import TransportQueryError
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_not_exception_type
+from tenacity import RetryCallState, retry, stop_after_attempt, wait_exponential, retry_if_not_exception_type
+
+import instrumentation
 
 # Constants
 BATCH_SIZE = 5
@@ -57,39 +60,64 @@ def setup_client() -> Client:
     )
     return Client(transport=transport, fetch_schema_from_transport=True)
 
+def count_retry(retry_state: RetryCallState) -> None:
+    """Record a retried STRATZ call in the instrumentation counters."""
+    instrumentation.count("stratz.retries")
+
 @retry(
     stop=stop_after_attempt(5),
     wait=wait_exponential(multiplier=1, min=4, max=10),
     retry=retry_if_not_exception_type(TransportQueryError),
+    before_sleep=count_retry,
     reraise=True,
 )
 def retry_client_execute(client: Client, query: gql, variable_values: Dict[str, Any]) -> Dict[str, Any]:
     """Execute a GraphQL query with retry logic."""
-    return client.execute(query, variable_values=variable_values)
+    with instrumentation.observe("stratz.matches") as call:
+        response = client.execute(query, variable_values=variable_values)
+        if instrumentation.is_enabled():
+            headers = getattr(client.transport, "response_headers", None)
+            call.bytes = instrumentation.payload_size(headers, response)
+    return response
 
 def get_player_ids() -> List[int]:
     """Read player IDs from the CSV file."""
     pd_data = pd.read_csv(PLAYERS_FILE)
     return pd_data["steamAccountId"].tolist()
 
-def fetch_matches() -> None:
-    """Fetch match data for players in batches and save to JSON files."""
+def fetch_matches(on_batch: Optional[Callable[[Path], None]] = None) -> Tuple[int, int]:
+    """Fetch match data for players in batches and save them to JSON files.
+
+    Failed batches are reported and skipped; they are fetched again on the next run.
+
+    Args:
+        on_batch: Called with the path of every batch file, both previously stored and newly fetched,
+            as soon as it is available on disk; exceptions it raises stop the download
+
+    Returns:
+        Number of newly fetched batches and number of batches that failed
+    """
     output_path = Path(OUTPUT_DIR)
     output_path.mkdir(exist_ok=True)
     
     client = setup_client()
     id_list = get_player_ids()
+    fetched = failed = 0
     
     for i, start in enumerate(range(0, len(id_list) + BATCH_SIZE, BATCH_SIZE)):
         store_file = output_path / f"{i}.json"
         
         if store_file.exists():
+            if on_batch:
+                on_batch(store_file)
             continue
             
         id_list_slice = id_list[start : start + BATCH_SIZE]
         if not id_list_slice:
             continue
             
+        # Write to a temporary file first so an interrupted write never leaves a truncated batch
+        tmp_file = store_file.with_name(f"{store_file.name}.tmp")
         try:
             response = retry_client_execute(
                 client,
@@ -97,21 +125,41 @@ def fetch_matches() -> None:
                 variable_values={"steam_account_ids": id_list_slice}
             )
             
-            with open(store_file, "w", encoding="utf-8") as f:
+            with open(tmp_file, "w", encoding="utf-8") as f:
                 json.dump(response, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_file, store_file)
                 
-            print(f"Successfully processed batch {i}")
-            
         except Exception as e:
+            tmp_file.unlink(missing_ok=True)
+            failed += 1
+            instrumentation.count("stratz.errors")
             print(f"Error processing batch {i}: {str(e)}")
+            continue
+
+        fetched += 1
+        print(f"Successfully processed batch {i}")
+        if on_batch:
+            on_batch(store_file)
 
-def main() -> None:
+    return fetched, failed
+
+def main(argv: Optional[List[str]] = None) -> None:
     """Main function to orchestrate the match data collection process."""
+    parser = argparse.ArgumentParser(description="Fetch matches of leaderboard players from the STRATZ API.")
+    instrumentation.add_arguments(parser)
+    instrumentation.configure(parser.parse_args(argv))
+
     try:
-        fetch_matches()
+        with instrumentation.span("fetch_matches") as stage:
+            fetched, failed = fetch_matches()
+            stage.add_records(fetched)
+        if failed:
+            print(f"{failed} batch(es) failed; run again to retry them")
     except Exception as e:
         print(f"Error: {str(e)}")
         raise
+    finally:
+        instrumentation.write_report("get_matches_by_player")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,7 +2,8 @@
 This module fetches Dota 2 player leaderboard data from the STRATZ API.
 """
 
-from typing import Dict, List
+from typing import Dict, List, Optional
+import argparse
 import collections
 import json
 import os
@@ -12,6 +13,8 @@ import pandas as pd
 from gql import gql, Client
 from gql.transport.requests import RequestsHTTPTransport
 
+import instrumentation
+
 # Constants
 DIVISIONS = ["AMERICAS", "SE_ASIA", "EUROPE", "CHINA"]
 API_URL = "https://api.stratz.com/graphql"
@@ -126,33 +129,42 @@ def setup_client() -> Client:
     )
     return Client(transport=transport, fetch_schema_from_transport=True)
 
-def get_data_files() -> None:
-    """Fetch player data for each division and save to JSON files."""
+def get_data_files() -> int:
+    """Fetch player data for each division, save to JSON files and return the number of divisions fetched."""
     client = setup_client()
     players_dir = Path("players")
     players_dir.mkdir(exist_ok=True)
+    fetched = 0
 
     for division in DIVISIONS:
         try:
-            response = client.execute(
-                query,
-                variable_values={
-                    "leaderboardRequestVariable": {"leaderBoardDivision": division},
-                    "skip": 0,
-                    "take": 10000,
-                    "skipUserFollowingData": True,
-                },
-            )
+            with instrumentation.observe("stratz.leaderboard") as call:
+                response = client.execute(
+                    query,
+                    variable_values={
+                        "leaderboardRequestVariable": {"leaderBoardDivision": division},
+                        "skip": 0,
+                        "take": 10000,
+                        "skipUserFollowingData": True,
+                    },
+                )
+                if instrumentation.is_enabled():
+                    headers = getattr(client.transport, "response_headers", None)
+                    call.bytes = instrumentation.payload_size(headers, response)
             
             output_file = players_dir / f"{division}.json"
             with open(output_file, "w", encoding="utf-8") as f:
                 json.dump(response, f, ensure_ascii=False, indent=4)
+            fetched += 1
                 
         except Exception as e:
+            instrumentation.count("stratz.errors")
             print(f"Error fetching data for {division}: {str(e)}")
 
-def merge_data_files() -> None:
-    """Merge all division JSON files into a single CSV file."""
+    return fetched
+
+def merge_data_files() -> int:
+    """Merge all division JSON files into a single CSV file and return the number of players."""
     data: Dict[str, List] = collections.defaultdict(list)
 
     for division in DIVISIONS:
@@ -173,11 +185,21 @@ def merge_data_files() -> None:
             print(f"Error processing {division} data: {str(e)}")
 
     pd.DataFrame(data).to_csv("players.csv", index=False)
+    return len(data["steamAccountId"])
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     """Main function to orchestrate the data collection and processing pipeline."""
-    get_data_files()
-    merge_data_files()
+    parser = argparse.ArgumentParser(description="Fetch leaderboard players from the STRATZ API.")
+    instrumentation.add_arguments(parser)
+    instrumentation.configure(parser.parse_args(argv))
+
+    try:
+        with instrumentation.span("fetch_players") as stage:
+            stage.add_records(get_data_files())
+        with instrumentation.span("merge_players") as stage:
+            stage.add_records(merge_data_files())
+    finally:
+        instrumentation.write_report("get_players")
 
 if __name__ == "__main__":
     main()
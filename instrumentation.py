@@ -0,0 +1,324 @@
+"""
+This module provides lightweight instrumentation shared by the data pipeline scripts.
+
+It records timed spans per pipeline stage (records/sec and peak RSS), latency histograms for
+repeated operations such as API calls, and counters such as retries. A stage can optionally be
+profiled with cProfile, and everything is written to a machine-readable JSON run report.
+
+Instrumentation is disabled by default; in that case ``span`` and ``observe`` return a shared
+no-op object and ``count`` returns immediately, so the overhead is a single attribute check.
+"""
+
+from typing import Any, Dict, List, Optional
+import argparse
+import bisect
+import cProfile
+import json
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Constants
+DEFAULT_PROFILE_DIR = "profiles"
+# Upper bounds (in seconds) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+@dataclass
+class StageSpan:
+    """Timing, throughput and memory of one pipeline stage.
+
+    ``peak_rss_mb`` and ``children_peak_rss_mb`` are high-water marks since process start (of
+    this process and of its largest finished child process, such as a process pool worker), so
+    they never decrease from one stage to the next. ``peak_rss_growth_mb`` is how much this
+    process's high-water mark rose during the stage, i.e. zero for stages that stayed below the
+    peak of an earlier one.
+    """
+    name: str
+    seconds: float = 0.0
+    records: Optional[int] = None
+    peak_rss_mb: Optional[float] = None
+    children_peak_rss_mb: Optional[float] = None
+    peak_rss_growth_mb: Optional[float] = None
+    profile_file: Optional[str] = None
+
+    def add_records(self, n: int) -> None:
+        """Add ``n`` processed records to the stage throughput."""
+        self.records = (self.records or 0) + n
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the span to a dictionary format."""
+        records_per_sec = None
+        if self.records is not None and self.seconds > 0:
+            records_per_sec = self.records / self.seconds
+        return {
+            "name": self.name,
+            "seconds": self.seconds,
+            "records": self.records,
+            "records_per_sec": records_per_sec,
+            "peak_rss_mb": self.peak_rss_mb,
+            "children_peak_rss_mb": self.children_peak_rss_mb,
+            "peak_rss_growth_mb": self.peak_rss_growth_mb,
+            "profile_file": self.profile_file,
+        }
+
+@dataclass
+class Observation:
+    """A single timed operation; ``bytes`` may be set by the caller while it runs."""
+    bytes: Optional[int] = None
+
+@dataclass
+class Histogram:
+    """Latency samples and payload sizes collected for one operation name."""
+    latencies: List[float] = field(default_factory=list)
+    total_bytes: int = 0
+
+    def add(self, seconds: float, n_bytes: Optional[int] = None) -> None:
+        """Record one operation."""
+        self.latencies.append(seconds)
+        if n_bytes:
+            self.total_bytes += n_bytes
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summarise the samples as count, percentiles and bucket counts."""
+        samples = sorted(self.latencies)
+        buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        for seconds in samples:
+            buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+        def percentile(q: float) -> Optional[float]:
+            if not samples:
+                return None
+            return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+        return {
+            "count": len(samples),
+            "total_seconds": sum(samples),
+            "mean_seconds": sum(samples) / len(samples) if samples else None,
+            "p50_seconds": percentile(0.5),
+            "p90_seconds": percentile(0.9),
+            "p99_seconds": percentile(0.99),
+            "max_seconds": samples[-1] if samples else None,
+            "bytes": self.total_bytes,
+            "buckets": {
+                **{f"le_{bound}": n for bound, n in zip(LATENCY_BUCKETS, buckets)},
+                "inf": buckets[-1],
+            },
+        }
+
+class _NullContext:
+    """Reusable no-op context manager returned while instrumentation is disabled."""
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __enter__(self) -> Any:
+        return self.value
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+class _NullSpan(StageSpan):
+    """Stage span that ignores everything recorded on it."""
+
+    def add_records(self, n: int) -> None:
+        pass
+
+class _NullObservation(Observation):
+    """Observation that ignores the payload size set on it."""
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        pass
+
+_NULL_SPAN = _NullContext(_NullSpan(name=""))
+_NULL_OBSERVATION = _NullContext(_NullObservation())
+
+class _State:
+    """Process-wide instrumentation state."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.report_file: Optional[Path] = None
+        self.profile_stages: Optional[List[str]] = None
+        self.profile_dir = Path(DEFAULT_PROFILE_DIR)
+        # cProfile supports only one active profiler, so nested stages share the outermost one
+        self.active_profiler: Optional[cProfile.Profile] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop everything recorded so far."""
+        self.started_at = datetime.now(timezone.utc)
+        self.start_time = time.perf_counter()
+        self.stages: List[StageSpan] = []
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+
+_state = _State()
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the instrumentation command line options to a script's argument parser."""
+    group = parser.add_argument_group("instrumentation")
+    group.add_argument("--report", metavar="PATH", help="write a JSON run report to PATH")
+    group.add_argument(
+        "--profile",
+        nargs="*",
+        metavar="STAGE",
+        help="profile the given stages (all stages if none given) with cProfile",
+    )
+    group.add_argument(
+        "--profile-dir",
+        default=DEFAULT_PROFILE_DIR,
+        help=f"directory for cProfile stats files (default: {DEFAULT_PROFILE_DIR})",
+    )
+
+def configure(args: argparse.Namespace) -> None:
+    """Enable instrumentation if the parsed arguments ask for a report or profiling."""
+    enable(report_file=args.report, profile_stages=args.profile, profile_dir=args.profile_dir)
+
+def enable(
+    report_file: Optional[str] = None,
+    profile_stages: Optional[List[str]] = None,
+    profile_dir: str = DEFAULT_PROFILE_DIR,
+) -> None:
+    """Enable instrumentation when a report file or profiling is requested.
+
+    Args:
+        report_file: Path of the JSON run report written by ``write_report``
+        profile_stages: Stage names to profile; an empty list profiles every stage
+        profile_dir: Directory the ``<stage>.prof`` files are written to
+    """
+    _state.report_file = Path(report_file) if report_file else None
+    _state.profile_stages = profile_stages
+    _state.profile_dir = Path(profile_dir)
+    _state.enabled = _state.report_file is not None or profile_stages is not None
+    _state.reset()
+
+def disable() -> None:
+    """Disable instrumentation and drop everything recorded so far."""
+    _state.enabled = False
+    _state.report_file = None
+    _state.profile_stages = None
+    _state.reset()
+
+def is_enabled() -> bool:
+    """Return whether instrumentation is currently recording."""
+    return _state.enabled
+
+def _peak_rss_mb(who: str = "RUSAGE_SELF") -> Optional[float]:
+    """Return the peak resident set size so far in MiB.
+
+    ``who`` is ``"RUSAGE_SELF"`` for this process or ``"RUSAGE_CHILDREN"`` for the largest of
+    its terminated and waited-for child processes.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(getattr(resource, who)).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _should_profile(name: str) -> bool:
+    stages = _state.profile_stages
+    return stages is not None and (not stages or name in stages)
+
+@contextmanager
+def _recording_span(name: str):
+    stage = StageSpan(name=name)
+    profiler = None
+    # A stage nested in a profiled stage is already covered by the outer profile
+    if _should_profile(name) and _state.active_profiler is None:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Another profiling tool is already active (Python 3.12+)
+            profiler = None
+        else:
+            _state.active_profiler = profiler
+    start_peak = _peak_rss_mb()
+    start = time.perf_counter()
+    try:
+        yield stage
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _state.active_profiler = None
+        stage.seconds = time.perf_counter() - start
+        stage.peak_rss_mb = _peak_rss_mb()
+        stage.children_peak_rss_mb = _peak_rss_mb("RUSAGE_CHILDREN")
+        if start_peak is not None:
+            stage.peak_rss_growth_mb = stage.peak_rss_mb - start_peak
+        if profiler is not None:
+            _state.profile_dir.mkdir(parents=True, exist_ok=True)
+            profile_file = _state.profile_dir / f"{name}.prof"
+            profiler.dump_stats(profile_file)
+            stage.profile_file = str(profile_file)
+        _state.stages.append(stage)
+
+def span(name: str):
+    """Time a pipeline stage.
+
+    Use as ``with span("parse") as stage: ...`` and call ``stage.add_records(n)`` to report
+    throughput. The stage is profiled with cProfile when requested via ``--profile``, unless it
+    runs inside another profiled stage, whose profile then already includes it.
+    """
+    if not _state.enabled:
+        return _NULL_SPAN
+    return _recording_span(name)
+
+@contextmanager
+def _recording_observation(name: str):
+    observation = Observation()
+    start = time.perf_counter()
+    try:
+        yield observation
+    finally:
+        histogram = _state.histograms.setdefault(name, Histogram())
+        histogram.add(time.perf_counter() - start, observation.bytes)
+
+def observe(name: str):
+    """Time one repeated operation (such as an API call) into the latency histogram ``name``.
+
+    The yielded observation's ``bytes`` attribute can be set to record the payload size.
+    """
+    if not _state.enabled:
+        return _NULL_OBSERVATION
+    return _recording_observation(name)
+
+def count(name: str, n: int = 1) -> None:
+    """Increment the counter ``name`` by ``n``."""
+    if not _state.enabled:
+        return
+    _state.counters[name] = _state.counters.get(name, 0) + n
+
+def payload_size(headers: Optional[Dict[str, str]], payload: Any) -> int:
+    """Return the size of a response body from its Content-Length header or its JSON payload."""
+    if headers and headers.get("Content-Length", "").isdigit():
+        return int(headers["Content-Length"])
+    return len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+def build_report(script: str) -> Dict[str, Any]:
+    """Build the run report of everything recorded so far."""
+    return {
+        "script": script,
+        "started_at": _state.started_at.isoformat(),
+        "wall_seconds": time.perf_counter() - _state.start_time,
+        "peak_rss_mb": _peak_rss_mb(),
+        "children_peak_rss_mb": _peak_rss_mb("RUSAGE_CHILDREN"),
+        "stages": [stage.to_dict() for stage in _state.stages],
+        "operations": {name: hist.to_dict() for name, hist in _state.histograms.items()},
+        "counters": dict(_state.counters),
+    }
+
+def write_report(script: str) -> None:
+    """Write the JSON run report if one was requested."""
+    if not _state.enabled or _state.report_file is None:
+        return
+    _state.report_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(_state.report_file, "w", encoding="utf-8") as f:
+        json.dump(build_report(script), f, indent=4)
@@ -2,7 +2,8 @@
 This module parses raw Dota 2 match data from JSON files and converts it into a structured format.
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import argparse
 import json
 from pathlib import Path
 from dataclasses import dataclass
@@ -10,6 +11,8 @@ from dataclasses import dataclass
 import jsonlines
 from tqdm import tqdm
 
+import instrumentation
+
 # Constants
 INPUT_DIR = "players_matches"
 OUTPUT_FILE = "matches.jsonl"
@@ -38,8 +41,11 @@ class MatchData:
 def parse_single_file(match_file: Path) -> List[Dict[str, Any]]:
     """Parse a single match data file and extract relevant information."""
     try:
-        with open(match_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with instrumentation.observe("parse_matches.json_load") as load:
+            with open(match_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if instrumentation.is_enabled():
+                load.bytes = match_file.stat().st_size
             
         result = []
         
@@ -84,34 +90,55 @@ def parse_single_file(match_file: Path) -> List[Dict[str, Any]]:
         print(f"Error processing file {match_file}: {str(e)}")
         return []
 
+def list_match_files(input_dir: str) -> List[Path]:
+    """List the match files in the input directory in batch order.
+
+    Files named by batch number come first, ordered numerically, followed by any other files
+    ordered by name, so the dataset is built in the same order on every run.
+    """
+    def batch_order(path: Path):
+        return (0, int(path.stem), "") if path.stem.isdigit() else (1, 0, path.name)
+
+    return sorted(Path(input_dir).glob("*.json"), key=batch_order)
+
 def process_match_files(input_dir: str, output_file: str) -> None:
     """Process all match files in the input directory and save results to output file."""
     input_path = Path(input_dir)
     if not input_path.exists():
         raise FileNotFoundError(f"Input directory not found: {input_dir}")
         
-    json_files = list(input_path.glob("*.json"))
+    json_files = list_match_files(input_dir)
     if not json_files:
         raise ValueError(f"No JSON files found in {input_dir}")
         
     records = []
     
-    for json_file in tqdm(json_files, desc="Processing match files"):
-        file_records = parse_single_file(json_file)
-        records.extend(file_records)
+    with instrumentation.span("parse_matches") as stage:
+        for json_file in tqdm(json_files, desc="Processing match files"):
+            file_records = parse_single_file(json_file)
+            records.extend(file_records)
+        stage.add_records(len(records))
         
     print(f"Processed {len(records)} matches from {len(json_files)} files")
     
-    with jsonlines.open(output_file, mode='w') as writer:
-        writer.write_all(records)
+    with instrumentation.span("write_matches") as stage:
+        with jsonlines.open(output_file, mode='w') as writer:
+            writer.write_all(records)
+        stage.add_records(len(records))
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     """Main function to orchestrate the match data processing pipeline."""
+    parser = argparse.ArgumentParser(description="Parse raw STRATZ match files into matches.jsonl.")
+    instrumentation.add_arguments(parser)
+    instrumentation.configure(parser.parse_args(argv))
+
     try:
         process_match_files(INPUT_DIR, OUTPUT_FILE)
     except Exception as e:
         print(f"Error: {str(e)}")
         raise
+    finally:
+        instrumentation.write_report("parse_matches")
 
 if __name__ == "__main__":
     main()
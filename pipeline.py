@@ -0,0 +1,370 @@
+"""
+This module orchestrates the full data pipeline, from fetching players to the EDA plots.
+
+The pipeline scripts are modelled as a DAG of stages with declared input and output paths. The
+content hashes of those paths are recorded after every run in a state file, so stages whose inputs
+and outputs are unchanged are skipped. When both the match download and the parse stage have to
+run, they are overlapped: every batch file is parsed and appended to the dataset as soon as it is
+on disk while later batches are still downloading.
+
+Heavy modules (pandas, gql, matplotlib) are only imported by the stages that actually run, so
+quick commands such as ``--status`` start fast.
+"""
+
+from typing import Callable, Dict, List, Optional
+import argparse
+import hashlib
+import json
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import instrumentation
+
+# Constants
+# Paths are duplicated from the stage scripts so that importing this module stays cheap
+STATE_FILE = ".pipeline_state.json"
+PLAYERS_DIR = "players"
+PLAYERS_FILE = "players.csv"
+MATCHES_DIR = "players_matches"
+MATCHES_FILE = "matches.jsonl"
+HEROES_FILE = "heroes.json"
+EDA_DIR = "EDA"
+# Modules imported by every stage script; changing them re-runs every stage
+SHARED_CODE = ["instrumentation.py"]
+HASH_CHUNK_SIZE = 1024 * 1024
+
+@dataclass
+class Stage:
+    """A pipeline stage: the paths it reads and writes and the function that runs it.
+
+    ``run`` may return the number of work items that failed; a stage with failures is not
+    recorded as up to date, so the next run retries it.
+    """
+    name: str
+    inputs: List[str]
+    outputs: List[str]
+    run: Callable[[], Optional[int]]
+    deps: List[str] = field(default_factory=list)
+
+class ContentHasher:
+    """Compute SHA-256 digests of files and directories.
+
+    File digests are cached by size and modification time, so unchanged files are not re-read.
+    """
+
+    def __init__(self, cache: Optional[Dict[str, Dict]] = None) -> None:
+        self.cache = cache if cache is not None else {}
+
+    def hash_file(self, path: Path) -> str:
+        """Return the digest of a single file."""
+        stat = path.stat()
+        cached = self.cache.get(str(path))
+        if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+            return cached["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        self.cache[str(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def hash_path(self, path: str) -> Optional[str]:
+        """Return the digest of a file or directory tree, or None if the path does not exist."""
+        path = Path(path)
+        if path.is_file():
+            return self.hash_file(path)
+        if not path.is_dir():
+            return None
+
+        digest = hashlib.sha256()
+        for file in sorted(p for p in path.rglob("*") if p.is_file()):
+            digest.update(str(file.relative_to(path)).encode("utf-8"))
+            digest.update(self.hash_file(file).encode("ascii"))
+        return digest.hexdigest()
+
+    def hash_paths(self, paths: List[str]) -> Dict[str, Optional[str]]:
+        """Return the digest of every path."""
+        return {path: self.hash_path(path) for path in paths}
+
+def load_state(state_file: str = STATE_FILE) -> Dict:
+    """Load the recorded file digests and stage hashes."""
+    if not Path(state_file).exists():
+        return {"files": {}, "stages": {}}
+    with open(state_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_state(state: Dict, state_file: str = STATE_FILE) -> None:
+    """Atomically write the recorded file digests and stage hashes."""
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_file, state_file)
+
+class _FetchCancelled(Exception):
+    """Raised in the download thread to stop fetching once the consumer has given up."""
+
+def run_players() -> int:
+    """Fetch the leaderboards, merge them into the players file and return the number of failed divisions."""
+    import get_players
+
+    fetched = get_players.get_data_files()
+    get_players.merge_data_files()
+    return len(get_players.DIVISIONS) - fetched
+
+def run_matches() -> int:
+    """Fetch match batches for all players and return the number of failed batches."""
+    import get_matches_by_player
+
+    _, failed = get_matches_by_player.fetch_matches()
+    return failed
+
+def run_parse() -> None:
+    """Parse all downloaded match batches into the dataset file."""
+    import parse_matches
+
+    parse_matches.process_match_files(MATCHES_DIR, MATCHES_FILE)
+
+def run_fetch_and_parse() -> int:
+    """Download match batches and parse them concurrently, returning the number of failed batches.
+
+    A producer thread fetches batches and queues every batch file once it is on disk; the main
+    thread parses queued files and appends their matches to a temporary dataset file, which
+    replaces the dataset once all batches are done. If anything fails, the temporary file is
+    removed and the function returns once the producer has stored its current batch and stopped.
+    """
+    import jsonlines
+    import get_matches_by_player
+    import parse_matches
+
+    batch_files: "queue.Queue[Optional[Path]]" = queue.Queue()
+    errors: List[BaseException] = []
+    failed: List[int] = []
+    stop = threading.Event()
+
+    def enqueue(batch_file: Path) -> None:
+        if stop.is_set():
+            raise _FetchCancelled()
+        batch_files.put(batch_file)
+
+    def produce() -> None:
+        try:
+            _, n_failed = get_matches_by_player.fetch_matches(on_batch=enqueue)
+            failed.append(n_failed)
+        except _FetchCancelled:
+            pass
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            batch_files.put(None)
+
+    producer = threading.Thread(target=produce, name="fetch-matches", daemon=True)
+    producer.start()
+
+    def append_batch(writer: "jsonlines.Writer", batch_file: Path) -> int:
+        records = parse_matches.parse_single_file(batch_file)
+        writer.write_all(records)
+        return len(records)
+
+    tmp_file = f"{MATCHES_FILE}.tmp"
+    parsed: List[Path] = []
+    n_matches = 0
+    try:
+        with instrumentation.span("parse_matches") as stage:
+            with jsonlines.open(tmp_file, mode="w") as writer:
+                while True:
+                    batch_file = batch_files.get()
+                    if batch_file is None:
+                        break
+                    n_matches += append_batch(writer, batch_file)
+                    parsed.append(batch_file)
+
+                # Use the same file set and order as a standalone parse: batches arrive in batch
+                # order, and leftover files (e.g. from an older, longer players file) sort after them
+                expected = parse_matches.list_match_files(MATCHES_DIR)
+                in_order = parsed == expected[:len(parsed)]
+                if in_order:
+                    for batch_file in expected[len(parsed):]:
+                        n_matches += append_batch(writer, batch_file)
+
+            if not in_order:
+                # Never let the dataset depend on arrival order: rebuild it in batch order
+                with jsonlines.open(tmp_file, mode="w") as writer:
+                    n_matches = sum(append_batch(writer, batch_file) for batch_file in expected)
+            stage.add_records(n_matches)
+
+        producer.join()
+        if errors:
+            raise errors[0]
+        os.replace(tmp_file, MATCHES_FILE)
+    finally:
+        stop.set()
+        producer.join()
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    print(f"Processed {n_matches} matches from {len(expected)} files")
+    return failed[0]
+
+def run_convert_matches() -> None:
+    """Renumber match ids in the dataset file."""
+    import convert_to_public_dataset
+
+    convert_to_public_dataset.process_matches(MATCHES_FILE)
+
+def run_convert_heroes() -> None:
+    """Standardise the hero reference file."""
+    import convert_to_public_dataset
+
+    convert_to_public_dataset.process_heroes(HEROES_FILE)
+
+def run_eda() -> None:
+    """Compute hero statistics and render the EDA plots."""
+    from EDA import EDA
+
+    EDA.run_eda(data_dir=Path("."), output_dir=Path(EDA_DIR))
+
+def build_stages() -> Dict[str, Stage]:
+    """Return the pipeline stages in topological order.
+
+    Each stage also depends on its own script and on the shared modules it imports, so code
+    changes re-run it. Stages that rewrite a file in place list it both as input and output.
+    """
+    eda_plots = [
+        f"{EDA_DIR}/heroes_pick_distribution.png",
+        f"{EDA_DIR}/heroes_ban_distribution.png",
+        f"{EDA_DIR}/heroes_winrate_distribution.png",
+    ]
+    stages = [
+        Stage("players", ["get_players.py", *SHARED_CODE], [PLAYERS_DIR, PLAYERS_FILE], run_players),
+        Stage("matches", ["get_matches_by_player.py", *SHARED_CODE, PLAYERS_FILE], [MATCHES_DIR],
+              run_matches, ["players"]),
+        Stage("parse", ["parse_matches.py", *SHARED_CODE, MATCHES_DIR], [MATCHES_FILE], run_parse, ["matches"]),
+        Stage("convert_matches", ["convert_to_public_dataset.py", *SHARED_CODE, MATCHES_FILE], [MATCHES_FILE],
+              run_convert_matches, ["parse"]),
+        Stage("convert_heroes", ["convert_to_public_dataset.py", *SHARED_CODE, HEROES_FILE], [HEROES_FILE],
+              run_convert_heroes),
+        Stage("eda", [f"{EDA_DIR}/EDA.py", *SHARED_CODE, MATCHES_FILE, HEROES_FILE], eda_plots, run_eda,
+              ["convert_matches", "convert_heroes"]),
+    ]
+    return {stage.name: stage for stage in stages}
+
+def select_stages(stages: Dict[str, Stage], targets: List[str]) -> List[Stage]:
+    """Return the target stages and everything they depend on, in pipeline order."""
+    selected = set()
+    pending = list(targets or stages)
+    while pending:
+        name = pending.pop()
+        if name not in stages:
+            raise ValueError(f"Unknown stage: {name}")
+        if name not in selected:
+            selected.add(name)
+            pending.extend(stages[name].deps)
+    return [stage for stage in stages.values() if stage.name in selected]
+
+def is_up_to_date(stage: Stage, state: Dict, hasher: ContentHasher) -> bool:
+    """Return whether the stage's inputs and outputs match the hashes recorded after its last run."""
+    recorded = state["stages"].get(stage.name)
+    if recorded is None:
+        return False
+    outputs = hasher.hash_paths(stage.outputs)
+    if None in outputs.values():
+        return False
+    return recorded["inputs"] == hasher.hash_paths(stage.inputs) and recorded["outputs"] == outputs
+
+def record_run(stage: Stage, stages: Dict[str, Stage], state: Dict, hasher: ContentHasher) -> None:
+    """Record the hashes of a stage after it ran.
+
+    Inputs are hashed after the run so in-place rewrites are not mistaken for changed inputs. Earlier
+    stages whose outputs this stage rewrote adopt the new hashes, so they do not look stale.
+    """
+    outputs = hasher.hash_paths(stage.outputs)
+    state["stages"][stage.name] = {"inputs": hasher.hash_paths(stage.inputs), "outputs": outputs}
+    for other in stages.values():
+        if other.name == stage.name or other.name not in state["stages"]:
+            continue
+        for path in set(other.outputs) & set(stage.outputs):
+            state["stages"][other.name]["outputs"][path] = outputs[path]
+
+def run_pipeline(
+    targets: Optional[List[str]] = None,
+    force: Optional[List[str]] = None,
+    state_file: str = STATE_FILE,
+) -> List[str]:
+    """Run all stale stages needed for the targets and return the names of the stages that ran.
+
+    Args:
+        targets: Stages to bring up to date (all stages if empty)
+        force: Stages to run even if up to date (all selected stages if an empty list)
+    """
+    stages = build_stages()
+    selected = select_stages(stages, targets or [])
+    forced = {stage.name for stage in selected} if force == [] else set(force or [])
+    state = load_state(state_file)
+    hasher = ContentHasher(state["files"])
+    ran: List[str] = []
+
+    for stage in selected:
+        if stage.name in ran:
+            continue
+        if stage.name not in forced and is_up_to_date(stage, state, hasher):
+            print(f"Skipping up-to-date stage: {stage.name}")
+            continue
+
+        # Matches are fetched and parsed concurrently when the parse stage is part of this run
+        overlap = stage.name == "matches" and "parse" in {s.name for s in selected}
+        print(f"Running stage: {stage.name}" + (" + parse" if overlap else ""))
+        with instrumentation.span(stage.name):
+            failures = run_fetch_and_parse() if overlap else stage.run()
+
+        ran.extend([stage.name, "parse"] if overlap else [stage.name])
+        if failures:
+            print(f"Stage {stage.name} had {failures} failure(s); it will run again next time")
+            continue
+
+        record_run(stage, stages, state, hasher)
+        if overlap:
+            record_run(stages["parse"], stages, state, hasher)
+        save_state(state, state_file)
+
+    return ran
+
+def print_status(targets: Optional[List[str]] = None, state_file: str = STATE_FILE) -> None:
+    """Print whether each selected stage is up to date, without running anything."""
+    stages = build_stages()
+    state = load_state(state_file)
+    hasher = ContentHasher(state["files"])
+    for stage in select_stages(stages, targets or []):
+        status = "up to date" if is_up_to_date(stage, state, hasher) else "stale"
+        print(f"{stage.name:<16} {status}")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Main function to run the pipeline from the command line."""
+    parser = argparse.ArgumentParser(description="Run the stale stages of the data pipeline.")
+    parser.add_argument("targets", nargs="*", metavar="STAGE",
+                        help=f"stages to bring up to date (default: all of {', '.join(build_stages())})")
+    parser.add_argument("--force", nargs="*", metavar="STAGE",
+                        help="run the given stages (all selected stages if none given) even if up to date")
+    parser.add_argument("--status", action="store_true", help="only show which stages are up to date")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.status:
+        print_status(args.targets)
+        return
+
+    instrumentation.configure(args)
+    try:
+        ran = run_pipeline(args.targets, args.force)
+        print(f"Ran {len(ran)} stage(s): {', '.join(ran) or 'none'}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        raise
+    finally:
+        instrumentation.write_report("pipeline")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import pytest
-from convert_to_public_dataset import process_matches
+import json
+from convert_to_public_dataset import process_heroes, process_matches
 
 @pytest.fixture
 def sample_match_data():
@@ -17,3 +18,14 @@ def test_process_matches(sample_match_data):
     assert isinstance(result, dict)
     assert "radiant_heroes" in result
     assert "dire_heroes" in result
+
+def test_process_heroes_is_idempotent(tmp_path):
+    heroes_file = tmp_path / "heroes.json"
+    heroes_file.write_text(json.dumps({"constants": {"heroes": {
+        "1": {"id": 1, "displayName": "Anti-Mage", "shortName": "antimage"}
+    }}}))
+    process_heroes(str(heroes_file))
+    converted = heroes_file.read_text()
+    process_heroes(str(heroes_file))
+    assert heroes_file.read_text() == converted
+    assert json.loads(converted) == {"heroes": [{"hero_id": 1, "display_name": "Anti-Mage", "name": "antimage"}]}
@@ -0,0 +1,105 @@
+import pytest
+import numpy as np
+from EDA import EDA
+from EDA.EDA import (
+    calculate_hero_statistics,
+    create_hero_dataframe,
+    add_confidence_intervals,
+    render_plots,
+    bootstrap_rates,
+    build_count_arrays,
+    wilson_interval,
+)
+
+@pytest.fixture
+def sample_matches():
+    return [
+        {
+            "match_id": i,
+            "radiant_win": i % 3 != 0,
+            "RadiantHeroes": [1, 2],
+            "DireHeroes": [3, 4],
+            "RadiantBanedHeroes": [5],
+            "DireBanedHeroes": [1] if i % 2 else [],
+        }
+        for i in range(30)
+    ]
+
+@pytest.fixture
+def sample_heroes():
+    return {hero_id: {"hero_id": hero_id, "name": f"hero_{hero_id}"} for hero_id in range(1, 6)}
+
+def test_wilson_interval():
+    low, high = wilson_interval([5, 0, 3], [10, 10, 0])
+    assert low[0] < 0.5 < high[0]
+    assert low[1] == pytest.approx(0)
+    assert 0 < high[1] < 0.5
+    assert np.isnan(low[2]) and np.isnan(high[2])
+
+def test_bootstrap_rates_is_reproducible(sample_matches):
+    arrays = build_count_arrays(sample_matches, [1, 2, 3, 4, 5])
+    first = bootstrap_rates(arrays, n_resamples=50, seed=1, n_jobs=1)
+    second = bootstrap_rates(arrays, n_resamples=50, seed=1, n_jobs=1)
+    assert first["win_rate"].shape == (50, 5)
+    np.testing.assert_array_equal(first["win_rate"], second["win_rate"])
+    np.testing.assert_allclose(first["usage_rate"].sum(axis=1), 1)
+
+def test_add_confidence_intervals(sample_matches, sample_heroes):
+    usage_stats = calculate_hero_statistics(sample_matches)
+    df = create_hero_dataframe(usage_stats, sample_heroes)
+    result = add_confidence_intervals(df, sample_matches, n_resamples=200, n_jobs=1)
+    for metric in ["usage_rate", "ban_rate", "win_rate"]:
+        for interval in ["wilson", "boot"]:
+            low, high = result[f"{metric}_{interval}_low"], result[f"{metric}_{interval}_high"]
+            picked = result[metric] > 0
+            assert (low[picked] <= result[metric][picked] + 1e-9).all()
+            assert (high[picked] >= result[metric][picked] - 1e-9).all()
+    # Hero 5 is never picked, so its win rate has no interval
+    never_picked = result[result["hero_id"] == 5].iloc[0]
+    assert np.isnan(never_picked["win_rate_wilson_low"])
+    assert np.isnan(never_picked["win_rate_boot_low"])
+
+def test_add_confidence_intervals_reuses_cached_bounds(sample_matches, sample_heroes, tmp_path, monkeypatch):
+    usage_stats = calculate_hero_statistics(sample_matches)
+    df = create_hero_dataframe(usage_stats, sample_heroes)
+    cache_file = tmp_path / "bounds.csv"
+    first = add_confidence_intervals(df, sample_matches, n_resamples=100, n_jobs=1, cache_file=cache_file)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("bootstrap should not run for unchanged inputs")
+
+    monkeypatch.setattr(EDA, "bootstrap_rates", fail)
+    second = add_confidence_intervals(df, sample_matches, n_resamples=100, n_jobs=1, cache_file=cache_file)
+    np.testing.assert_array_equal(first["win_rate_boot_low"], second["win_rate_boot_low"])
+
+    with pytest.raises(AssertionError, match="should not run"):
+        add_confidence_intervals(df, sample_matches, n_resamples=200, n_jobs=1, cache_file=cache_file)
+
+def test_render_plots_skips_unchanged_inputs(sample_matches, sample_heroes, tmp_path):
+    usage_stats = calculate_hero_statistics(sample_matches)
+    df = create_hero_dataframe(usage_stats, sample_heroes)
+    specs = [("usage_rate", "pick.png", False), ("win_rate", "winrate.png", True)]
+
+    rendered = render_plots(df, specs, tmp_path, n_jobs=1)
+    assert sorted(path.name for path in rendered) == ["pick.png", "winrate.png"]
+    assert (tmp_path / "pick.png").exists()
+
+    assert render_plots(df, specs, tmp_path, n_jobs=1) == []
+
+    df.loc[0, "win_rate"] = 1.0
+    rendered = render_plots(df, specs, tmp_path, n_jobs=1)
+    assert [path.name for path in rendered] == ["winrate.png"]
+
+def test_render_plots_tracks_html_separately(sample_matches, sample_heroes, tmp_path):
+    usage_stats = calculate_hero_statistics(sample_matches)
+    df = create_hero_dataframe(usage_stats, sample_heroes)
+    specs = [("win_rate", "winrate.png", True)]
+
+    rendered = render_plots(df, specs, tmp_path, html=True, n_jobs=1)
+    assert sorted(path.name for path in rendered) == ["winrate.html", "winrate.png"]
+    assert render_plots(df, specs, tmp_path, html=True, n_jobs=1) == []
+
+    # Updating only the PNG must leave the HTML stale
+    df.loc[0, "win_rate"] = 1.0
+    assert [path.name for path in render_plots(df, specs, tmp_path, n_jobs=1)] == ["winrate.png"]
+    assert [path.name for path in render_plots(df, specs, tmp_path, html=True, n_jobs=1)] == ["winrate.html"]
@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import patch, MagicMock
-from get_matches_by_player import retry_client_execute
+from get_matches_by_player import fetch_matches, retry_client_execute
 
 @pytest.fixture(autouse=True)
 def mock_env_api_key():
@@ -32,3 +32,12 @@ def test_retry_client_execute(mock_response):
     result = retry_client_execute(mock_client, mock_query, mock_vars)
     assert result == mock_response
     mock_client.execute.assert_called_once_with(mock_query, variable_values=mock_vars)
+
+def test_fetch_matches_never_leaves_truncated_batches(tmp_path, monkeypatch, mock_response):
+    monkeypatch.chdir(tmp_path)
+    mock_client = MagicMock()
+    mock_client.execute.side_effect = [mock_response, {"data": object()}]
+    with patch('get_matches_by_player.setup_client', return_value=mock_client), \
+         patch('get_matches_by_player.get_player_ids', return_value=list(range(10))):
+        assert fetch_matches() == (1, 1)
+    assert [p.name for p in (tmp_path / "players_matches").iterdir()] == ["0.json"]
@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import patch, MagicMock
-from get_players import setup_client, DIVISIONS
+from get_players import get_data_files, setup_client, DIVISIONS
 
 @pytest.fixture(autouse=True)
 def mock_env_api_key():
@@ -14,3 +14,11 @@ def test_setup_client():
 
 def test_division_names():
     assert all(d in ["AMERICAS", "SE_ASIA", "EUROPE", "CHINA"] for d in DIVISIONS)
+
+def test_get_data_files_counts_successful_divisions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    mock_client = MagicMock()
+    mock_client.execute.side_effect = [{"leaderboard": {}}, Exception("timeout")] * 2
+    with patch('get_players.setup_client', return_value=mock_client):
+        assert get_data_files() == 2
+    assert sorted(p.name for p in (tmp_path / "players").iterdir()) == ["AMERICAS.json", "EUROPE.json"]
@@ -0,0 +1,69 @@
+import pytest
+import json
+import pstats
+import instrumentation
+
+@pytest.fixture(autouse=True)
+def reset_instrumentation():
+    yield
+    instrumentation.disable()
+
+def test_disabled_by_default_records_nothing(tmp_path):
+    with instrumentation.span("stage") as stage:
+        stage.add_records(10)
+    with instrumentation.observe("call") as call:
+        call.bytes = 100
+    instrumentation.count("retries")
+    report = instrumentation.build_report("test")
+    assert report["stages"] == []
+    assert report["operations"] == {}
+    assert report["counters"] == {}
+
+def test_report_contains_stages_operations_and_counters(tmp_path):
+    report_file = tmp_path / "report.json"
+    instrumentation.enable(report_file=str(report_file))
+
+    with instrumentation.span("parse") as stage:
+        stage.add_records(5)
+    for _ in range(3):
+        with instrumentation.observe("stratz.matches") as call:
+            call.bytes = 10
+    instrumentation.count("stratz.retries", 2)
+    instrumentation.write_report("test")
+
+    report = json.loads(report_file.read_text())
+    assert report["script"] == "test"
+    assert report["stages"][0]["name"] == "parse"
+    assert report["stages"][0]["records"] == 5
+    assert report["operations"]["stratz.matches"]["count"] == 3
+    assert report["operations"]["stratz.matches"]["bytes"] == 30
+    assert sum(report["operations"]["stratz.matches"]["buckets"].values()) == 3
+    assert report["counters"] == {"stratz.retries": 2}
+
+def test_profile_dumps_stats_for_selected_stage(tmp_path):
+    instrumentation.enable(profile_stages=["parse"], profile_dir=str(tmp_path))
+    with instrumentation.span("parse"):
+        sum(range(1000))
+    with instrumentation.span("write"):
+        pass
+    assert (tmp_path / "parse.prof").exists()
+    assert not (tmp_path / "write.prof").exists()
+
+def _work_after_inner_span():
+    return sum(range(1000))
+
+def test_nested_profiled_spans_share_outer_profile(tmp_path):
+    instrumentation.enable(profile_stages=[], profile_dir=str(tmp_path))
+    with instrumentation.span("outer"):
+        with instrumentation.span("inner"):
+            sum(range(1000))
+        _work_after_inner_span()
+
+    stats = pstats.Stats(str(tmp_path / "outer.prof"))
+    assert any(func[2] == "_work_after_inner_span" for func in stats.stats)
+    assert not (tmp_path / "inner.prof").exists()
+
+    report = instrumentation.build_report("test")
+    assert [stage["name"] for stage in report["stages"]] == ["inner", "outer"]
+    assert report["stages"][1]["profile_file"] == str(tmp_path / "outer.prof")
+    assert report["stages"][0]["profile_file"] is None
@@ -0,0 +1,178 @@
+import pytest
+import dataclasses
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import jsonlines
+import pipeline
+from pathlib import Path
+from pipeline import ContentHasher, Stage, run_fetch_and_parse, run_pipeline, select_stages
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def fake_stages(monkeypatch):
+    calls = []
+
+    def make_stage(name, inputs, outputs, deps=()):
+        def run():
+            calls.append(name)
+            for output in outputs:
+                source = "".join(open(i).read() for i in inputs)
+                with open(output, "w") as f:
+                    f.write(f"{name}:{source}")
+            return failures.pop(0) if failures else None
+        return Stage(name, inputs, outputs, run, list(deps))
+
+    failures = []
+
+    stages = {
+        "first": make_stage("first", ["source.txt"], ["first.txt"]),
+        "second": make_stage("second", ["first.txt"], ["second.txt"], ["first"]),
+    }
+    monkeypatch.setattr(pipeline, "build_stages", lambda: stages)
+    return failures
+
+def test_content_hasher_reuses_cached_digest(workdir):
+    (workdir / "data").mkdir()
+    (workdir / "data" / "a.txt").write_text("a")
+    hasher = ContentHasher()
+    digest = hasher.hash_path("data")
+    assert hasher.hash_path("data") == digest
+    assert len(hasher.cache) == 1
+    (workdir / "data" / "b.txt").write_text("b")
+    assert hasher.hash_path("data") != digest
+    assert hasher.hash_path("missing") is None
+
+def test_select_stages_includes_dependencies():
+    stages = pipeline.build_stages()
+    names = [stage.name for stage in select_stages(stages, ["parse"])]
+    assert names == ["players", "matches", "parse"]
+
+def test_run_pipeline_skips_up_to_date_stages(workdir, fake_stages):
+    (workdir / "source.txt").write_text("v1")
+    assert run_pipeline() == ["first", "second"]
+    assert run_pipeline() == []
+    assert run_pipeline(force=["second"]) == ["second"]
+
+    (workdir / "source.txt").write_text("v2")
+    assert run_pipeline() == ["first", "second"]
+
+    (workdir / "second.txt").unlink()
+    assert run_pipeline() == ["second"]
+
+def test_run_pipeline_retries_stage_with_failures(workdir, fake_stages):
+    (workdir / "source.txt").write_text("v1")
+    fake_stages.append(2)
+    assert run_pipeline() == ["first", "second"]
+    assert run_pipeline() == ["first"]
+    assert run_pipeline() == []
+
+def test_quick_commands_do_not_import_heavy_modules(workdir):
+    script = (
+        "import json, sys, pipeline; pipeline.main(['--status']); "
+        "print(json.dumps([m for m in ['pandas', 'gql', 'matplotlib', 'numpy'] if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=workdir,
+        env={**os.environ, "PYTHONPATH": str(REPO_ROOT)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert "stale" in result.stdout
+    assert json.loads(result.stdout.splitlines()[-1]) == []
+
+def _write_batch(batch_file, match_id):
+    batch_file.write_text(json.dumps({"players": [{"matches": [
+        {"id": match_id, "didRadiantWin": True, "pickBans": [{"isPick": True, "isRadiant": True, "heroId": 1}]}
+    ]}]}))
+
+def test_run_fetch_and_parse_matches_standalone_parse(workdir, monkeypatch):
+    import get_matches_by_player
+    from parse_matches import process_match_files
+
+    matches_dir = workdir / pipeline.MATCHES_DIR
+    matches_dir.mkdir()
+    # Leftover batches from an older, longer players file
+    _write_batch(matches_dir / "10.json", 10)
+    _write_batch(matches_dir / "3.json", 3)
+
+    def fake_fetch_matches(on_batch=None):
+        for i in range(3):
+            batch_file = matches_dir / f"{i}.json"
+            _write_batch(batch_file, i)
+            on_batch(batch_file)
+        return 3, 0
+
+    monkeypatch.setattr(get_matches_by_player, "fetch_matches", fake_fetch_matches)
+    assert run_fetch_and_parse() == 0
+    with jsonlines.open(workdir / pipeline.MATCHES_FILE) as reader:
+        overlapped = [match["match_id"] for match in reader]
+    assert overlapped == [0, 1, 2, 3, 10]
+
+    process_match_files(pipeline.MATCHES_DIR, "standalone.jsonl")
+    with jsonlines.open(workdir / "standalone.jsonl") as reader:
+        assert [match["match_id"] for match in reader] == overlapped
+
+def test_run_fetch_and_parse_cleans_up_when_parsing_fails(workdir, monkeypatch):
+    import get_matches_by_player
+    import parse_matches
+
+    matches_dir = workdir / pipeline.MATCHES_DIR
+    matches_dir.mkdir()
+    fetched = []
+
+    def fake_fetch_matches(on_batch=None):
+        for i in range(100):
+            batch_file = matches_dir / f"{i}.json"
+            _write_batch(batch_file, i)
+            fetched.append(i)
+            on_batch(batch_file)
+            time.sleep(0.01)
+        return 100, 0
+
+    def broken_parse(batch_file):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(get_matches_by_player, "fetch_matches", fake_fetch_matches)
+    monkeypatch.setattr(parse_matches, "parse_single_file", broken_parse)
+    with pytest.raises(RuntimeError, match="disk full"):
+        run_fetch_and_parse()
+
+    assert not any(thread.name == "fetch-matches" for thread in threading.enumerate())
+    assert len(fetched) < 100
+    assert not (workdir / f"{pipeline.MATCHES_FILE}.tmp").exists()
+
+def test_convert_heroes_and_eda_can_run_twice(workdir, monkeypatch):
+    stages = pipeline.build_stages()
+    monkeypatch.setattr(pipeline, "build_stages", lambda: {
+        "convert_heroes": stages["convert_heroes"],
+        "eda": dataclasses.replace(stages["eda"], deps=["convert_heroes"]),
+    })
+    (workdir / "EDA").mkdir()
+    (workdir / pipeline.HEROES_FILE).write_text(json.dumps({"constants": {"heroes": {
+        str(hero_id): {"id": hero_id, "displayName": f"Hero {hero_id}", "shortName": f"hero_{hero_id}"}
+        for hero_id in range(1, 6)
+    }}}))
+    with jsonlines.open(workdir / pipeline.MATCHES_FILE, mode="w") as writer:
+        writer.write_all([
+            {"match_id": i, "radiant_win": i % 2 == 0, "RadiantHeroes": [1, 2], "DireHeroes": [3, 4],
+             "RadiantBanedHeroes": [5], "DireBanedHeroes": []}
+            for i in range(4)
+        ])
+
+    assert run_pipeline(force=[]) == ["convert_heroes", "eda"]
+    assert run_pipeline(force=[]) == ["convert_heroes", "eda"]
+    assert (workdir / "EDA" / "heroes_winrate_distribution.png").exists()
+    assert json.loads((workdir / pipeline.HEROES_FILE).read_text())["heroes"][0]["name"] == "hero_1"
+    assert run_pipeline() == []